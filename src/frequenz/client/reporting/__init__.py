@@ -7,6 +7,6 @@ This package provides a low-level interface for interacting with the reporting A
 """
 
 
-from ._client import ReportingApiClient
+from ._client import ComponentsDataBatch, MetricSample, ReportingApiClient
 
-__all__ = ["ReportingApiClient"]
+__all__ = ["ComponentsDataBatch", "MetricSample", "ReportingApiClient"]
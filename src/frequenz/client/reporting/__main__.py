@@ -5,14 +5,18 @@
 
 import argparse
 import asyncio
+import sys
 from datetime import datetime, timedelta
 from pprint import pprint
-from typing import AsyncIterator
+from typing import AsyncIterator, Callable
 
 from frequenz.client.common.metric import Metric
 
-from frequenz.client.reporting import ReportingApiClient
-from frequenz.client.reporting._client import MetricSample
+from frequenz.client.reporting import (
+    ComponentsDataBatch,
+    MetricSample,
+    ReportingApiClient,
+)
 
 
 def main() -> None:
@@ -25,7 +29,13 @@ def main() -> None:
         default="localhost:50051",
     )
     parser.add_argument("--mid", type=int, help="Microgrid ID", required=True)
-    parser.add_argument("--cid", type=int, help="Component ID", required=True)
+    parser.add_argument(
+        "--cid",
+        type=int,
+        nargs="+",
+        help="Component IDs, all requested in a single stream",
+        required=True,
+    )
     parser.add_argument(
         "--metrics",
         type=str,
@@ -76,28 +86,45 @@ def main() -> None:
         default=None,
     )
     args = parser.parse_args()
-    asyncio.run(
-        run(
-            microgrid_id=args.mid,
-            component_id=args.cid,
-            metric_names=args.metrics,
-            start_dt=args.start,
-            end_dt=args.end,
-            resampling_period_s=args.resampling_period_s,
-            states=args.states,
-            bounds=args.bounds,
-            service_address=args.url,
-            key=args.key,
-            fmt=args.format,
+    with asyncio.Runner(loop_factory=_event_loop_factory()) as runner:
+        runner.run(
+            run(
+                microgrid_id=args.mid,
+                component_ids=args.cid,
+                metric_names=args.metrics,
+                start_dt=args.start,
+                end_dt=args.end,
+                resampling_period_s=args.resampling_period_s,
+                states=args.states,
+                bounds=args.bounds,
+                service_address=args.url,
+                key=args.key,
+                fmt=args.format,
+            )
         )
-    )
+
+
+def _event_loop_factory() -> Callable[[], asyncio.AbstractEventLoop] | None:
+    """Get the factory of the event loop to run the client in.
+
+    uvloop is used if it is installed, as it handles the many small messages
+    of a stream with considerably less overhead than the default event loop.
+
+    Returns:
+        The uvloop event loop factory, or None to use the default event loop.
+    """
+    try:
+        import uvloop  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        return None
+    return uvloop.new_event_loop
 
 
 # pylint: disable=too-many-arguments, too-many-locals
 async def run(
     *,
     microgrid_id: int,
-    component_id: int,
+    component_ids: list[int],
     metric_names: list[str],
     start_dt: datetime | None,
     end_dt: datetime | None,
@@ -112,7 +139,7 @@ async def run(
 
     Args:
         microgrid_id: microgrid ID
-        component_id: component ID
+        component_ids: component IDs
         metric_names: list of metric names
         start_dt: start datetime, if None, the earliest available data will be used
         end_dt: end datetime, if None starts streaming indefinitely from start_dt
@@ -130,13 +157,13 @@ async def run(
 
     metrics = [Metric[mn] for mn in metric_names]
 
-    def data_iter() -> AsyncIterator[MetricSample]:
-        """Iterate over single metric.
+    def data_iter() -> AsyncIterator[ComponentsDataBatch]:
+        """Iterate over the batches of the components.
 
         Just a wrapper around the client method for readability.
 
         Returns:
-            Iterator over single metric samples
+            Iterator over batches of components samples
         """
         resampling_period = (
             timedelta(seconds=resampling_period_s)
@@ -144,9 +171,8 @@ async def run(
             else None
         )
 
-        return client.list_single_component_data(
-            microgrid_id=microgrid_id,
-            component_id=component_id,
+        return client.list_microgrid_components_data_batches(
+            microgrid_components=[(microgrid_id, component_ids)],
             metrics=metrics,
             start_dt=start_dt,
             end_dt=end_dt,
@@ -156,9 +182,10 @@ async def run(
         )
 
     if fmt == "iter":
-        # Iterate over single metric generator
-        async for sample in data_iter():
-            print(sample)
+        # Iterate over the samples of each batch
+        async for batch in data_iter():
+            for sample in batch:
+                print(sample)
 
     elif fmt == "dict":
         # Dumping all data as a single dict
@@ -166,11 +193,26 @@ async def run(
         pprint(dct)
 
     elif fmt == "csv":
+        # Write directly to the binary stdout, bypassing `print`
+        write = sys.stdout.buffer.write
         # Print header
-        print(",".join(MetricSample._fields))
-        # Iterate over single metric generator and format as CSV
-        async for sample in data_iter():
-            print(",".join(str(e) for e in sample))
+        write(f"{','.join(MetricSample._fields)}\n".encode())
+        # Format the samples of each batch as CSV and write them at once,
+        # so large batches need a single write instead of one per row
+        async for batch in data_iter():
+            lines: list[str] = []
+            # Consecutive samples usually share the same timestamp object,
+            # so only format it when it changes
+            last_ts: datetime | None = None
+            last_ts_str = ""
+            # Rows are unpacked right away, so zip can reuse its tuple
+            # instead of creating a `MetricSample` per row
+            for ts, mid, cid, met, value in zip(*batch.to_columns().values()):
+                if ts is not last_ts:
+                    last_ts, last_ts_str = ts, str(ts)
+                lines.append(f"{last_ts_str},{mid},{cid},{met},{value}\n")
+            write("".join(lines).encode())
+        sys.stdout.buffer.flush()
 
     else:
         raise ValueError(f"Invalid output format: {fmt}")
@@ -179,8 +221,8 @@ async def run(
 
 
 async def iter_to_dict(
-    components_data_iter: AsyncIterator[MetricSample],
-) -> dict[int, dict[int, dict[datetime, dict[Metric, float]]]]:
+    components_data_iter: AsyncIterator[ComponentsDataBatch],
+) -> dict[int, dict[int, dict[datetime, dict[str, float | None]]]]:
     """Convert components data iterator into a single dict.
 
         The nesting structure is:
@@ -195,22 +237,27 @@ async def iter_to_dict(
         }
 
     Args:
-        components_data_iter: async generator
+        components_data_iter: async iterator over components data batches
 
     Returns:
         Single dict with with all components data
     """
-    ret: dict[int, dict[int, dict[datetime, dict[Metric, float]]]] = {}
-
-    async for ts, mid, cid, met, value in components_data_iter:
-        if mid not in ret:
-            ret[mid] = {}
-        if cid not in ret[mid]:
-            ret[mid][cid] = {}
-        if ts not in ret[mid][cid]:
-            ret[mid][cid][ts] = {}
+    ret: dict[int, dict[int, dict[datetime, dict[str, float | None]]]] = {}
 
-        ret[mid][cid][ts][met] = value
+    # Samples arrive grouped by component, so the dict of the current
+    # component is only looked up again when the component changes
+    last_mid: int | None = None
+    last_cid: int | None = None
+    cdata: dict[datetime, dict[str, float | None]] = {}
+    async for batch in components_data_iter:
+        for ts, mid, cid, met, value in zip(*batch.to_columns().values()):
+            if cid != last_cid or mid != last_mid:
+                cdata = ret.setdefault(mid, {}).setdefault(cid, {})
+                last_mid, last_cid = mid, cid
+            tsdata = cdata.get(ts)
+            if tsdata is None:
+                tsdata = cdata[ts] = {}
+            tsdata[met] = value
 
     return ret
 
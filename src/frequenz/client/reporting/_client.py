@@ -3,11 +3,13 @@
 
 """Client for requests to the Reporting API."""
 
-from collections import namedtuple
-from collections.abc import AsyncIterator, Iterable, Iterator
+import asyncio
+import functools
+from collections.abc import AsyncGenerator, AsyncIterator, Iterator
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
-from typing import cast
+from itertools import repeat
+from typing import Any, NamedTuple, cast
 
 import grpc.aio as grpcaio
 
@@ -30,21 +32,136 @@ from frequenz.api.reporting.v1.reporting_pb2 import (
 )
 from frequenz.api.reporting.v1.reporting_pb2 import TimeFilter as PBTimeFilter
 from frequenz.api.reporting.v1.reporting_pb2_grpc import ReportingStub
+from frequenz.client.base.channel import ChannelOptions
 from frequenz.client.base.client import BaseApiClient
-from frequenz.client.base.exception import ClientNotConnected
+from frequenz.client.base.exception import ApiClientError, ClientNotConnected
 from frequenz.client.common.metric import Metric
 from google.protobuf.timestamp_pb2 import Timestamp as PBTimestamp
 
-MetricSample = namedtuple(
-    "MetricSample", ["timestamp", "microgrid_id", "component_id", "metric", "value"]
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+"""The UNIX epoch as a tz-aware datetime."""
+
+_NAIVE_EPOCH = datetime(1970, 1, 1)
+"""The UNIX epoch as a tz-naive datetime."""
+
+_FILTER_OPTIONS = (
+    PBIncludeOptions.FilterOption.FILTER_OPTION_EXCLUDE,
+    PBIncludeOptions.FilterOption.FILTER_OPTION_INCLUDE,
 )
-"""Type for a sample of a time series incl. metric type, microgrid and component ID
+"""The include filter options, indexed by whether to include the data."""
+
+_METRIC_NAMES: dict[int, str] = {}
+"""Cache of the metric names by protobuf metric value.
 
-A named tuple was chosen to allow safe access to the fields while keeping the
-simplicity of a tuple. This data type can be easily used to create a numpy array
-or a pandas DataFrame.
+`Metric.from_proto` scans all metrics, so each name is only looked up once.
 """
 
+_BOUND_NAMES: dict[tuple[str, int], tuple[str, str]] = {}
+"""Cache of the lower and upper bound names by metric name and bound index."""
+
+
+def _to_datetime(ts: PBTimestamp, cache: dict[tuple[int, int], datetime]) -> datetime:
+    """Convert a protobuf timestamp into a tz-aware UTC datetime.
+
+    Samples in a batch usually share their timestamps, so the converted
+    datetimes are memoized in the given cache.
+
+    Args:
+        ts: The protobuf timestamp to convert.
+        cache: The cache of already converted timestamps.
+
+    Returns:
+        The converted datetime.
+    """
+    key = (ts.seconds, ts.nanos)
+    dt = cache.get(key)
+    if dt is None:
+        dt = cache[key] = _EPOCH + timedelta(
+            seconds=key[0], microseconds=key[1] // 1000
+        )
+    return dt
+
+
+def _set_timestamp(ts: PBTimestamp, dt: datetime) -> None:
+    """Set a protobuf timestamp from a datetime.
+
+    The fields are assigned directly from the offset to the epoch, instead of
+    going through `Timestamp.FromDatetime`.
+
+    Args:
+        ts: The protobuf timestamp to set.
+        dt: The datetime to set it to. If it's tz-naive, it's assumed to be in UTC.
+    """
+    delta = dt - (_NAIVE_EPOCH if dt.utcoffset() is None else _EPOCH)
+    ts.seconds = delta.days * 86400 + delta.seconds
+    ts.nanos = delta.microseconds * 1000
+
+
+@functools.lru_cache(maxsize=32)
+def _request_template(
+    *,
+    metrics: tuple[Metric, ...],
+    resolution: int | None,
+    include_states: bool,
+    include_bounds: bool,
+) -> PBReceiveMicrogridComponentsDataStreamRequest:
+    """Build the parts of a request that don't depend on the components and time.
+
+    The templates are cached, as clients usually issue many requests with the
+    same metrics and options. The returned message is shared, so it must only
+    be copied into requests and never be modified.
+
+    Args:
+        metrics: The metrics to request.
+        resolution: The resampling resolution in seconds, if any.
+        include_states: Whether to include the state data.
+        include_bounds: Whether to include the bound data.
+
+    Returns:
+        The request without microgrid components and with an empty time filter.
+    """
+    return PBReceiveMicrogridComponentsDataStreamRequest(
+        metrics=[
+            PBMetricConnections(
+                metric=metric.to_proto(),
+                connections=[],
+            )
+            for metric in metrics
+        ],
+        filter=PBReceiveMicrogridComponentsDataStreamRequest.StreamFilter(
+            time_filter=PBTimeFilter(),
+            resampling_options=PBResamplingOptions(resolution=resolution),
+            include_options=PBIncludeOptions(
+                bounds=_FILTER_OPTIONS[include_bounds],
+                states=_FILTER_OPTIONS[include_states],
+            ),
+        ),
+    )
+
+
+class MetricSample(NamedTuple):
+    """Type for a sample of a time series incl. metric type, microgrid and component ID.
+
+    A named tuple was chosen to allow safe access to the fields while keeping the
+    simplicity of a tuple. This data type can be easily used to create a numpy array
+    or a pandas DataFrame.
+    """
+
+    timestamp: datetime
+    """The timestamp of the sample."""
+
+    microgrid_id: int
+    """The microgrid ID."""
+
+    component_id: int
+    """The component ID."""
+
+    metric: str
+    """The metric name."""
+
+    value: float | None
+    """The value of the sample."""
+
 
 @dataclass(frozen=True)
 class ComponentsDataBatch:
@@ -59,103 +176,354 @@ class ComponentsDataBatch:
         Returns:
             True if the batch contains no valid data.
         """
-        if not self._data_pb.components:
-            return True
-        if (
-            not self._data_pb.components[0].metric_samples
-            and not self._data_pb.components[0].states
-        ):
+        components = self._data_pb.components
+        if not components:
             return True
-        return False
+        first = components[0]
+        return not first.metric_samples and not first.states
 
-    # pylint: disable=too-many-locals
     def __iter__(self) -> Iterator[MetricSample]:
-        """Get generator that iterates over all values in the batch.
+        """Get an iterator over all values in the batch.
 
         Note: So far only `SimpleMetricSample` in the `MetricSampleVariant`
         message is supported.
 
-
-        Yields:
-            A named tuple with the following fields:
+        Returns:
+            An iterator over named tuples with the following fields:
             * timestamp: The timestamp of the metric sample.
             * microgrid_id: The microgrid ID.
             * component_id: The component ID.
             * metric: The metric name.
             * value: The metric value.
         """
+        # tuple.__new__ skips the argument handling of the named tuple's __new__
+        return cast(
+            Iterator[MetricSample],
+            map(tuple.__new__, repeat(MetricSample), zip(*self._columns.values())),
+        )
+
+    def to_list(self) -> list[MetricSample]:
+        """Get all values in the batch as a list.
+
+        Returns:
+            A list of all samples in the batch, in the same order as when
+                iterating over the batch.
+        """
+        return list(self)
+
+    def to_columns(self) -> dict[str, list[Any]]:
+        """Get all values in the batch as columns.
+
+        The columns are filled in a single pass over the protobuf message, without
+        creating an object per sample. They can be passed directly to e.g.
+        `pandas.DataFrame` or `pyarrow.table`.
+
+        Note: So far only `SimpleMetricSample` in the `MetricSampleVariant`
+        message is supported.
+
+        Returns:
+            A dict mapping the `MetricSample` field names to the lists of values,
+                in the same order as the samples of the batch.
+        """
+        return {name: list(column) for name, column in self._columns.items()}
+
+    # pylint: disable=too-many-locals
+    @functools.cached_property
+    def _columns(self) -> dict[str, list[Any]]:
+        """The columns of the batch, decoded from the protobuf message only once.
+
+        Iterating over the batch again, or getting its columns, reuses them. They
+        are shared, so they must not be modified.
+
+        Returns:
+            A dict mapping the `MetricSample` field names to the lists of values.
+        """
         data = self._data_pb
-        mid = data.microgrid_id
+        metric_names = _METRIC_NAMES
+        bound_names = _BOUND_NAMES
+        timestamps: dict[tuple[int, int], datetime] = {}
+        ts_col: list[datetime] = []
+        cid_col: list[int] = []
+        metric_col: list[str] = []
+        value_col: list[float | None] = []
+        add_ts = ts_col.append
+        add_cid = cid_col.append
+        add_metric = metric_col.append
+        add_value = value_col.append
         for cdata in data.components:
             cid = cdata.component_id
             for msample in cdata.metric_samples:
-                ts = msample.sampled_at.ToDatetime()
-                # Ensure tz-aware timestamps,
-                # as the API returns tz-naive UTC timestamps
-                ts = ts.replace(tzinfo=timezone.utc)
-                met = Metric.from_proto(msample.metric).name
-                value = (
-                    msample.value.simple_metric.value
-                    if msample.value.simple_metric
-                    else None
-                )
-                yield MetricSample(
-                    timestamp=ts,
-                    microgrid_id=mid,
-                    component_id=cid,
-                    metric=met,
-                    value=value,
-                )
-                for i, bound in enumerate(msample.bounds):
-                    if bound.lower:
-                        yield MetricSample(
-                            timestamp=ts,
-                            microgrid_id=mid,
-                            component_id=cid,
-                            metric=f"{met}_bound_{i}_lower",
-                            value=bound.lower,
-                        )
-                    if bound.upper:
-                        yield MetricSample(
-                            timestamp=ts,
-                            microgrid_id=mid,
-                            component_id=cid,
-                            metric=f"{met}_bound_{i}_upper",
-                            value=bound.upper,
+                ts = _to_datetime(msample.sampled_at, timestamps)
+                pb_metric = msample.metric
+                met = metric_names.get(pb_metric)
+                if met is None:
+                    met = metric_names[pb_metric] = Metric.from_proto(pb_metric).name
+                add_ts(ts)
+                add_cid(cid)
+                add_metric(met)
+                mvalue = msample.value
+                value: float | None = mvalue.simple_metric.value
+                # An unset value reads as 0.0, so only zeros need to be checked
+                if not value and not mvalue.HasField("simple_metric"):
+                    value = None
+                add_value(value)
+                bounds = msample.bounds
+                # Bounds are only sent on request, so skip setting up the loop
+                # for the common case of samples without bounds
+                if not bounds:
+                    continue
+                for i, bound in enumerate(bounds):
+                    names = bound_names.get((met, i))
+                    if names is None:
+                        names = bound_names[met, i] = (
+                            f"{met}_bound_{i}_lower",
+                            f"{met}_bound_{i}_upper",
                         )
+                    # Bounds of 0.0 are valid, so check presence, not the value
+                    if bound.HasField("lower"):
+                        add_ts(ts)
+                        add_cid(cid)
+                        add_metric(names[0])
+                        add_value(bound.lower)
+                    if bound.HasField("upper"):
+                        add_ts(ts)
+                        add_cid(cid)
+                        add_metric(names[1])
+                        add_value(bound.upper)
             for state in cdata.states:
-                ts = state.sampled_at.ToDatetime()
-                for name, category in {
-                    "state": state.states,
-                    "warning": state.warnings,
-                    "error": state.errors,
-                }.items():
-                    # Skip if the category is not present
-                    if not isinstance(category, Iterable):
-                        continue
-                    # Each category can have multiple states
-                    # that are provided as individual samples
-                    for s in category:
-                        yield MetricSample(
-                            timestamp=ts,
-                            microgrid_id=mid,
-                            component_id=cid,
-                            metric=name,
-                            value=s,
-                        )
+                ts = _to_datetime(state.sampled_at, timestamps)
+                # Each category can have multiple states
+                # that are provided as individual samples
+                for name, codes in (
+                    ("state", state.states),
+                    ("warning", state.warnings),
+                    ("error", state.errors),
+                ):
+                    count = len(codes)
+                    ts_col.extend([ts] * count)
+                    cid_col.extend([cid] * count)
+                    metric_col.extend([name] * count)
+                    value_col.extend(codes)
+        return {
+            "timestamp": ts_col,
+            "microgrid_id": [data.microgrid_id] * len(ts_col),
+            "component_id": cid_col,
+            "metric": metric_col,
+            "value": value_col,
+        }
+
+
+_PREFETCH_BATCHES = 8
+"""The number of responses of a stream to receive ahead of its consumer."""
+
+
+async def _prefetch(
+    responses: AsyncIterator[PBReceiveMicrogridComponentsDataStreamResponse],
+    queue: asyncio.Queue[PBReceiveMicrogridComponentsDataStreamResponse],
+) -> None:
+    """Receive the responses of a stream into a queue.
+
+    The stream ends, or fails, when this coroutine returns or raises.
+
+    Args:
+        responses: The responses to receive.
+        queue: The queue to put the responses into.
+    """
+    async for response in responses:
+        await queue.put(response)
+
+
+class _ComponentsDataBatchStream:
+    """An async iterator wrapping the responses of a stream into batches.
+
+    The responses are received by a background task, up to `_PREFETCH_BATCHES`
+    ahead of the consumer, so the stream keeps being read while the consumer
+    processes a batch. The task and the RPC are stopped by `aclose()`, which is
+    also called when the consumer is cancelled while waiting for a batch.
+    """
+
+    def __init__(
+        self,
+        stream: AsyncIterator[PBReceiveMicrogridComponentsDataStreamResponse],
+        *,
+        server_url: str,
+    ) -> None:
+        """Initialize this instance.
+
+        Args:
+            stream: The stream of responses from the Reporting service.
+            server_url: The URL of the Reporting service, to report errors.
+        """
+        self._stream = stream
+        self._responses = aiter(stream)
+        self._server_url = server_url
+        self._queue: asyncio.Queue[PBReceiveMicrogridComponentsDataStreamResponse] = (
+            asyncio.Queue(maxsize=_PREFETCH_BATCHES)
+        )
+        self._prefetching: asyncio.Task[None] | None = None
+        self._done = False
+        self._closed = False
+
+    def __del__(self) -> None:
+        """Stop receiving responses once the stream is no longer used."""
+        if self._prefetching is not None and not self._prefetching.done():
+            self._prefetching.cancel()
+
+    async def aclose(self) -> None:
+        """Stop receiving responses and cancel the RPC.
+
+        Iterating over the stream afterwards ends right away.
+        """
+        if self._closed:
+            return
+        self._closed = self._done = True
+        if self._prefetching is not None:
+            self._prefetching.cancel()
+            # Wait for the task to stop using the responses before closing them
+            await asyncio.wait([self._prefetching])
+        if isinstance(self._stream, grpcaio.Call):
+            self._stream.cancel()
+        if isinstance(self._responses, AsyncGenerator):
+            await self._responses.aclose()
+
+    def __aiter__(self) -> "_ComponentsDataBatchStream":
+        """Get the async iterator over the batches.
+
+        Returns:
+            This instance.
+        """
+        return self
+
+    async def __anext__(self) -> ComponentsDataBatch:
+        """Get the next batch from the stream.
+
+        Returns:
+            The next batch of components data.
+
+        Raises:
+            StopAsyncIteration: When the stream ends.
+            ApiClientError: When the RPC fails.
+            asyncio.CancelledError: When cancelled while waiting, after closing
+                the stream.
+        """
+        if self._done:
+            raise StopAsyncIteration
+        if self._prefetching is None:
+            self._prefetching = asyncio.create_task(
+                _prefetch(self._responses, self._queue)
+            )
+        try:
+            response = await self._get_response(self._prefetching)
+        except asyncio.CancelledError:
+            # Either the consumer or the stream itself was cancelled
+            await self.aclose()
+            raise
+        except grpcaio.AioRpcError as e:
+            raise ApiClientError.from_grpc_error(
+                server_url=self._server_url,
+                operation="ReceiveMicrogridComponentsDataStream",
+                grpc_error=e,
+            ) from e
+        if response is None:
+            raise StopAsyncIteration
+        return ComponentsDataBatch(response)
+
+    async def _get_response(
+        self, prefetching: asyncio.Task[None]
+    ) -> PBReceiveMicrogridComponentsDataStreamResponse | None:
+        """Get the next received response.
+
+        This waits for either a new response or the end of the prefetching task,
+        so the consumer is never left waiting for a task that already stopped.
+
+        Args:
+            prefetching: The task receiving the responses.
+
+        Returns:
+            The next response, or `None` if the stream ended.
+
+        Raises:
+            asyncio.CancelledError: When cancelled while waiting.
+        """
+        queue = self._queue
+        if queue.empty() and not prefetching.done():
+            getting = asyncio.ensure_future(queue.get())
+            try:
+                await asyncio.wait(
+                    [getting, prefetching], return_when=asyncio.FIRST_COMPLETED
+                )
+            except asyncio.CancelledError:
+                getting.cancel()
+                raise
+            if getting.done():
+                return getting.result()
+            getting.cancel()
+        if not queue.empty():
+            return queue.get_nowait()
+        self._done = True
+        # Raise any error the stream ended with, including its cancellation
+        await prefetching
+        return None
+
+
+async def _iter_samples(
+    batches: AsyncIterator[ComponentsDataBatch],
+) -> AsyncIterator[MetricSample]:
+    """Iterate over the samples of all batches, decoding them in a worker thread.
+
+    The next batch is already being received while the current one is decoded,
+    so decoding large batches doesn't stall the stream. Samples are yielded as
+    soon as their batch is decoded, without waiting for the next batch.
+
+    Args:
+        batches: The batches to iterate over.
+
+    Yields:
+        The samples of each batch, in order.
+    """
+    batches = aiter(batches)
+    receiving = asyncio.ensure_future(anext(batches, None))
+    try:
+        while (batch := await receiving) is not None:
+            receiving = asyncio.ensure_future(anext(batches, None))
+            for sample in await asyncio.to_thread(batch.to_list):
+                yield sample
+    finally:
+        receiving.cancel()
+        await asyncio.wait([receiving])
+        if (aclose := getattr(batches, "aclose", None)) is not None:
+            await aclose()
 
 
 class ReportingApiClient(BaseApiClient[ReportingStub]):
     """A client for the Reporting service."""
 
-    def __init__(self, server_url: str, key: str | None = None) -> None:
+    def __init__(
+        self,
+        server_url: str,
+        key: str | None = None,
+        *,
+        connect: bool = True,
+        channel_defaults: ChannelOptions = ChannelOptions(),
+    ) -> None:
         """Create a new Reporting client.
 
         Args:
             server_url: The URL of the Reporting service.
             key: The API key for the authorization.
+            connect: Whether to connect to the server as soon as a client instance
+                is created. If `False`, the client will not connect to the server
+                until `connect()` is called.
+            channel_defaults: The default options for the gRPC channel, used when
+                not given in the server URL. This allows tuning e.g. the HTTP2
+                keep-alive for long running streams.
         """
-        super().__init__(server_url, ReportingStub)
+        super().__init__(
+            server_url,
+            ReportingStub,
+            connect=connect,
+            channel_defaults=channel_defaults,
+        )
 
         self._metadata = (("key", key),) if key else ()
 
@@ -196,7 +564,53 @@ class ReportingApiClient(BaseApiClient[ReportingStub]):
             * timestamp: The timestamp of the metric sample.
             * value: The metric value.
         """
-        async for batch in self._list_microgrid_components_data_batch(
+        async for sample in _iter_samples(
+            self.list_single_component_data_batches(
+                microgrid_id=microgrid_id,
+                component_id=component_id,
+                metrics=metrics,
+                start_dt=start_dt,
+                end_dt=end_dt,
+                resampling_period=resampling_period,
+                include_states=include_states,
+                include_bounds=include_bounds,
+            )
+        ):
+            yield sample
+
+    # pylint: disable=too-many-arguments
+    def list_single_component_data_batches(
+        self,
+        *,
+        microgrid_id: int,
+        component_id: int,
+        metrics: Metric | list[Metric],
+        start_dt: datetime | None,
+        end_dt: datetime | None,
+        resampling_period: timedelta | None,
+        include_states: bool = False,
+        include_bounds: bool = False,
+    ) -> AsyncIterator[ComponentsDataBatch]:
+        """Iterate over the data batches for a single metric.
+
+        Iterating over the samples of each batch is synchronous, so this is
+        cheaper than iterating over the individual samples from
+        `list_single_component_data` when processing large amounts of data.
+
+        Args:
+            microgrid_id: The microgrid ID.
+            component_id: The component ID.
+            metrics: The metric name or list of metric names.
+            start_dt: start datetime, if None, the earliest available data will be used
+            end_dt: end datetime, if None starts streaming indefinitely from start_dt
+            resampling_period: The period for resampling the data.
+            include_states: Whether to include the state data.
+            include_bounds: Whether to include the bound data.
+
+        Returns:
+            An async iterator over the batches of components data.
+        """
+        return self._list_microgrid_components_data_batch(
             microgrid_components=[(microgrid_id, [component_id])],
             metrics=[metrics] if isinstance(metrics, Metric) else metrics,
             start_dt=start_dt,
@@ -204,9 +618,7 @@ class ReportingApiClient(BaseApiClient[ReportingStub]):
             resampling_period=resampling_period,
             include_states=include_states,
             include_bounds=include_bounds,
-        ):
-            for entry in batch:
-                yield entry
+        )
 
     # pylint: disable=too-many-arguments
     async def list_microgrid_components_data(
@@ -240,7 +652,51 @@ class ReportingApiClient(BaseApiClient[ReportingStub]):
             * timestamp: The timestamp of the metric sample.
             * value: The metric value.
         """
-        async for batch in self._list_microgrid_components_data_batch(
+        async for sample in _iter_samples(
+            self.list_microgrid_components_data_batches(
+                microgrid_components=microgrid_components,
+                metrics=metrics,
+                start_dt=start_dt,
+                end_dt=end_dt,
+                resampling_period=resampling_period,
+                include_states=include_states,
+                include_bounds=include_bounds,
+            )
+        ):
+            yield sample
+
+    # pylint: disable=too-many-arguments
+    def list_microgrid_components_data_batches(
+        self,
+        *,
+        microgrid_components: list[tuple[int, list[int]]],
+        metrics: Metric | list[Metric],
+        start_dt: datetime | None,
+        end_dt: datetime | None,
+        resampling_period: timedelta | None,
+        include_states: bool = False,
+        include_bounds: bool = False,
+    ) -> AsyncIterator[ComponentsDataBatch]:
+        """Iterate over the data batches for multiple microgrids and components.
+
+        Iterating over the samples of each batch is synchronous, so this is
+        cheaper than iterating over the individual samples from
+        `list_microgrid_components_data` when processing large amounts of data.
+
+        Args:
+            microgrid_components: List of tuples where each tuple contains
+                                  microgrid ID and corresponding component IDs.
+            metrics: The metric name or list of metric names.
+            start_dt: start datetime, if None, the earliest available data will be used
+            end_dt: end datetime, if None starts streaming indefinitely from start_dt
+            resampling_period: The period for resampling the data.
+            include_states: Whether to include the state data.
+            include_bounds: Whether to include the bound data.
+
+        Returns:
+            An async iterator over the batches of components data.
+        """
+        return self._list_microgrid_components_data_batch(
             microgrid_components=microgrid_components,
             metrics=[metrics] if isinstance(metrics, Metric) else metrics,
             start_dt=start_dt,
@@ -248,13 +704,11 @@ class ReportingApiClient(BaseApiClient[ReportingStub]):
             resampling_period=resampling_period,
             include_states=include_states,
             include_bounds=include_bounds,
-        ):
-            for entry in batch:
-                yield entry
+        )
 
     # pylint: disable=too-many-arguments
     # pylint: disable=too-many-locals
-    async def _list_microgrid_components_data_batch(
+    def _list_microgrid_components_data_batch(
         self,
         *,
         microgrid_components: list[tuple[int, list[int]]],
@@ -279,77 +733,37 @@ class ReportingApiClient(BaseApiClient[ReportingStub]):
             include_states: Whether to include the state data.
             include_bounds: Whether to include the bound data.
 
-        Yields:
-            A ComponentsDataBatch object of microgrid components data.
+        Returns:
+            An async iterator over the batches of microgrid components data.
         """
         microgrid_components_pb = [
             PBMicrogridComponentIDs(microgrid_id=mid, component_ids=cids)
             for mid, cids in microgrid_components
         ]
 
-        def dt2ts(dt: datetime) -> PBTimestamp:
-            ts = PBTimestamp()
-            ts.FromDatetime(dt)
-            return ts
-
-        time_filter = PBTimeFilter(
-            start=dt2ts(start_dt) if start_dt else None,
-            end=dt2ts(end_dt) if end_dt else None,
-        )
-
-        incl_states = (
-            PBIncludeOptions.FilterOption.FILTER_OPTION_INCLUDE
-            if include_states
-            else PBIncludeOptions.FilterOption.FILTER_OPTION_EXCLUDE
-        )
-        incl_bounds = (
-            PBIncludeOptions.FilterOption.FILTER_OPTION_INCLUDE
-            if include_bounds
-            else PBIncludeOptions.FilterOption.FILTER_OPTION_EXCLUDE
-        )
-        include_options = PBIncludeOptions(
-            bounds=incl_bounds,
-            states=incl_states,
-        )
-
-        stream_filter = PBReceiveMicrogridComponentsDataStreamRequest.StreamFilter(
-            time_filter=time_filter,
-            resampling_options=PBResamplingOptions(
+        request = PBReceiveMicrogridComponentsDataStreamRequest()
+        request.CopyFrom(
+            _request_template(
+                metrics=tuple(metrics),
                 resolution=(
                     round(resampling_period.total_seconds())
                     if resampling_period is not None
                     else None
-                )
-            ),
-            include_options=include_options,
-        )
-
-        metric_conns_pb = [
-            PBMetricConnections(
-                metric=metric.to_proto(),
-                connections=[],
-            )
-            for metric in metrics
-        ]
-
-        request = PBReceiveMicrogridComponentsDataStreamRequest(
-            microgrid_components=microgrid_components_pb,
-            metrics=metric_conns_pb,
-            filter=stream_filter,
-        )
-
-        try:
-            stream = cast(
-                AsyncIterator[PBReceiveMicrogridComponentsDataStreamResponse],
-                self.stub.ReceiveMicrogridComponentsDataStream(
-                    request, metadata=self._metadata
                 ),
+                include_states=include_states,
+                include_bounds=include_bounds,
             )
-            async for response in stream:
-                if not response:
-                    break
-                yield ComponentsDataBatch(response)
-
-        except grpcaio.AioRpcError as e:
-            print(f"RPC failed: {e}")
-            return
+        )
+        request.microgrid_components.extend(microgrid_components_pb)
+        if start_dt:
+            _set_timestamp(request.filter.time_filter.start, start_dt)
+        if end_dt:
+            _set_timestamp(request.filter.time_filter.end, end_dt)
+
+        stream = cast(
+            AsyncIterator[PBReceiveMicrogridComponentsDataStreamResponse],
+            self.stub.ReceiveMicrogridComponentsDataStream(
+                request, metadata=self._metadata
+            ),
+        )
+        return _ComponentsDataBatchStream(stream, server_url=self.server_url)
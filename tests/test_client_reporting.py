@@ -2,14 +2,34 @@
 # Copyright © 2024 Frequenz Energy-as-a-Service GmbH
 
 """Tests for the frequenz.client.reporting package."""
-from unittest.mock import MagicMock, patch
+import asyncio
+from collections.abc import AsyncIterator
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock, PropertyMock, patch
 
+import grpc
+import grpc.aio as grpcaio
 import pytest
+
+# pylint: disable=no-name-in-module
+from frequenz.api.reporting.v1.reporting_pb2 import (
+    ReceiveMicrogridComponentsDataStreamResponse as PBReceiveMicrogridComponentsDataStreamResponse,
+)
 from frequenz.api.reporting.v1.reporting_pb2_grpc import ReportingStub
+from frequenz.client.base.channel import ChannelOptions, KeepAliveOptions
 from frequenz.client.base.client import BaseApiClient
+from frequenz.client.base.exception import ServiceUnavailable
+from frequenz.client.common.metric import Metric
+from google.protobuf.timestamp_pb2 import Timestamp as PBTimestamp
 
 from frequenz.client.reporting import ReportingApiClient
-from frequenz.client.reporting._client import ComponentsDataBatch
+from frequenz.client.reporting._client import (
+    ComponentsDataBatch,
+    MetricSample,
+    _ComponentsDataBatchStream,
+    _iter_samples,
+    _set_timestamp,
+)
 
 
 @pytest.mark.asyncio
@@ -17,7 +37,29 @@ async def test_client_initialization() -> None:
     """Test that the client initializes the BaseApiClient."""
     with patch.object(BaseApiClient, "__init__", return_value=None) as mock_base_init:
         client = ReportingApiClient("gprc://localhost:50051")  # noqa: F841
-        mock_base_init.assert_called_once_with("gprc://localhost:50051", ReportingStub)
+        mock_base_init.assert_called_once_with(
+            "gprc://localhost:50051",
+            ReportingStub,
+            connect=True,
+            channel_defaults=ChannelOptions(),
+        )
+
+
+def test_client_initialization_channel_defaults() -> None:
+    """Test that the channel defaults are passed to the BaseApiClient."""
+    channel_defaults = ChannelOptions(
+        keep_alive=KeepAliveOptions(interval=timedelta(seconds=30))
+    )
+    with patch.object(BaseApiClient, "__init__", return_value=None) as mock_base_init:
+        ReportingApiClient(
+            "gprc://localhost:50051", connect=False, channel_defaults=channel_defaults
+        )
+        mock_base_init.assert_called_once_with(
+            "gprc://localhost:50051",
+            ReportingStub,
+            connect=False,
+            channel_defaults=channel_defaults,
+        )
 
 
 def test_components_data_batch_is_empty_true() -> None:
@@ -35,3 +77,329 @@ def test_components_data_batch_is_empty_false() -> None:
     data_pb.components[0].metric_samples = [MagicMock()]
     batch = ComponentsDataBatch(_data_pb=data_pb)
     assert batch.is_empty() is False
+
+
+def test_components_data_batch_iter_timestamps_are_tz_aware() -> None:
+    """Test that metric and state samples carry tz-aware UTC timestamps."""
+    data_pb = PBReceiveMicrogridComponentsDataStreamResponse(microgrid_id=1)
+    cdata = data_pb.components.add(component_id=2)
+    msample = cdata.metric_samples.add(metric=Metric.AC_ACTIVE_POWER.to_proto())
+    msample.sampled_at.seconds = 1_700_000_000
+    msample.sampled_at.nanos = 123_456_789
+    msample.value.simple_metric.value = 42.0
+    state = cdata.states.add(states=[1])
+    state.sampled_at.seconds = 1_700_000_001
+
+    samples = list(ComponentsDataBatch(_data_pb=data_pb))
+
+    assert samples == [
+        MetricSample(
+            datetime(2023, 11, 14, 22, 13, 20, 123456, tzinfo=timezone.utc),
+            1,
+            2,
+            "AC_ACTIVE_POWER",
+            42.0,
+        ),
+        MetricSample(
+            datetime(2023, 11, 14, 22, 13, 21, tzinfo=timezone.utc), 1, 2, "state", 1
+        ),
+    ]
+
+
+async def test_components_data_batch_stream_raises_on_rpc_error() -> None:
+    """Test that the batch stream wraps responses and raises RPC errors."""
+    response = PBReceiveMicrogridComponentsDataStreamResponse(microgrid_id=1)
+
+    async def stream() -> AsyncIterator[PBReceiveMicrogridComponentsDataStreamResponse]:
+        yield response
+        raise grpcaio.AioRpcError(
+            grpc.StatusCode.UNAVAILABLE,
+            grpcaio.Metadata(),
+            grpcaio.Metadata(),
+            details="unavailable",
+            debug_error_string="",
+        )
+
+    batches = _ComponentsDataBatchStream(stream(), server_url="grpc://localhost")
+
+    assert await anext(batches) == ComponentsDataBatch(_data_pb=response)
+    with pytest.raises(ServiceUnavailable) as exc_info:
+        await anext(batches)
+    assert exc_info.value.is_retryable
+    with pytest.raises(StopAsyncIteration):
+        await anext(batches)
+
+
+async def test_components_data_batch_stream_prefetches() -> None:
+    """Test that the batch stream receives responses ahead of the consumer."""
+    response = PBReceiveMicrogridComponentsDataStreamResponse(microgrid_id=1)
+    received = 0
+
+    async def stream() -> AsyncIterator[PBReceiveMicrogridComponentsDataStreamResponse]:
+        nonlocal received
+        for _ in range(3):
+            received += 1
+            yield response
+
+    batches = _ComponentsDataBatchStream(stream(), server_url="grpc://localhost")
+    first = await anext(batches)
+    await asyncio.sleep(0)
+
+    assert received == 3
+    assert [first] + [batch async for batch in batches] == [
+        ComponentsDataBatch(_data_pb=response)
+    ] * 3
+
+
+async def test_components_data_batch_stream_closes_on_cancel() -> None:
+    """Test that cancelling the consumer closes the stream."""
+    response = PBReceiveMicrogridComponentsDataStreamResponse(microgrid_id=1)
+    closed = asyncio.Event()
+
+    async def stream() -> AsyncIterator[PBReceiveMicrogridComponentsDataStreamResponse]:
+        try:
+            yield response
+            await asyncio.Event().wait()
+        finally:
+            closed.set()
+
+    batches = _ComponentsDataBatchStream(stream(), server_url="grpc://localhost")
+    consumer = asyncio.create_task(anext(batches))
+    assert await consumer == ComponentsDataBatch(_data_pb=response)
+    consumer = asyncio.create_task(anext(batches))
+    await asyncio.sleep(0)
+    consumer.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await consumer
+    assert closed.is_set()
+    with pytest.raises(StopAsyncIteration):
+        await anext(batches)
+
+
+async def test_components_data_batch_stream_cancelled_stream() -> None:
+    """Test that the consumer is woken up when the stream itself is cancelled."""
+    response = PBReceiveMicrogridComponentsDataStreamResponse(microgrid_id=1)
+
+    async def stream() -> AsyncIterator[PBReceiveMicrogridComponentsDataStreamResponse]:
+        yield response
+        await asyncio.sleep(0)
+        raise asyncio.CancelledError()
+
+    batches = _ComponentsDataBatchStream(stream(), server_url="grpc://localhost")
+    assert await anext(batches) == ComponentsDataBatch(_data_pb=response)
+    consumer = asyncio.ensure_future(anext(batches))
+    done, _ = await asyncio.wait([consumer], timeout=1)
+
+    assert consumer in done
+    assert consumer.cancelled()
+    with pytest.raises(StopAsyncIteration):
+        await anext(batches)
+
+
+async def test_components_data_batch_stream_aclose() -> None:
+    """Test that closing the stream stops prefetching from a pending stream."""
+    response = PBReceiveMicrogridComponentsDataStreamResponse(microgrid_id=1)
+    closed = False
+
+    async def stream() -> AsyncIterator[PBReceiveMicrogridComponentsDataStreamResponse]:
+        nonlocal closed
+        try:
+            while True:
+                yield response
+        finally:
+            closed = True
+
+    batches = _ComponentsDataBatchStream(stream(), server_url="grpc://localhost")
+    await anext(batches)
+    # Let the prefetching fill the queue and wait for room
+    await asyncio.sleep(0)
+    await batches.aclose()
+
+    assert closed
+
+
+async def test_iter_samples_closes_batches_on_cancel() -> None:
+    """Test that cancelling the sample consumer closes the batch stream."""
+    data_pb = PBReceiveMicrogridComponentsDataStreamResponse(microgrid_id=1)
+    data_pb.components.add(component_id=2).metric_samples.add(
+        metric=Metric.AC_ACTIVE_POWER.to_proto()
+    )
+    closed = asyncio.Event()
+
+    async def stream() -> AsyncIterator[PBReceiveMicrogridComponentsDataStreamResponse]:
+        try:
+            yield data_pb
+            await asyncio.Event().wait()
+        finally:
+            closed.set()
+
+    samples = _iter_samples(
+        _ComponentsDataBatchStream(stream(), server_url="grpc://localhost")
+    )
+    await anext(samples)
+    consumer = asyncio.ensure_future(anext(samples))
+    await asyncio.sleep(0)
+    consumer.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await consumer
+    assert closed.is_set()
+
+
+def test_components_data_batch_to_columns() -> None:
+    """Test that the columns match the samples of the batch."""
+    data_pb = PBReceiveMicrogridComponentsDataStreamResponse(microgrid_id=1)
+    cdata = data_pb.components.add(component_id=2)
+    msample = cdata.metric_samples.add(metric=Metric.AC_ACTIVE_POWER.to_proto())
+    msample.sampled_at.seconds = 1_700_000_000
+    msample.value.simple_metric.value = 42.0
+    msample.bounds.add(lower=-10.0, upper=10.0)
+    state = cdata.states.add(states=[1], warnings=[2, 3])
+    state.sampled_at.seconds = 1_700_000_000
+    batch = ComponentsDataBatch(_data_pb=data_pb)
+    ts = datetime(2023, 11, 14, 22, 13, 20, tzinfo=timezone.utc)
+
+    assert batch.to_columns() == {
+        "timestamp": [ts] * 6,
+        "microgrid_id": [1] * 6,
+        "component_id": [2] * 6,
+        "metric": [
+            "AC_ACTIVE_POWER",
+            "AC_ACTIVE_POWER_bound_0_lower",
+            "AC_ACTIVE_POWER_bound_0_upper",
+            "state",
+            "warning",
+            "warning",
+        ],
+        "value": [42.0, -10.0, 10.0, 1, 2, 3],
+    }
+    assert list(batch) == [
+        MetricSample(*row) for row in zip(*batch.to_columns().values())
+    ]
+
+
+def test_components_data_batch_to_columns_zero_bounds() -> None:
+    """Test that zero bounds are included and unset bounds are skipped."""
+    data_pb = PBReceiveMicrogridComponentsDataStreamResponse(microgrid_id=1)
+    msample = data_pb.components.add(component_id=2).metric_samples.add(
+        metric=Metric.AC_ACTIVE_POWER.to_proto()
+    )
+    msample.value.simple_metric.value = 42.0
+    msample.bounds.add(lower=0.0)
+    msample.bounds.add(upper=0.0)
+    batch = ComponentsDataBatch(_data_pb=data_pb)
+
+    columns = batch.to_columns()
+    assert columns["metric"] == [
+        "AC_ACTIVE_POWER",
+        "AC_ACTIVE_POWER_bound_0_lower",
+        "AC_ACTIVE_POWER_bound_1_upper",
+    ]
+    assert columns["value"] == [42.0, 0.0, 0.0]
+
+
+def test_components_data_batch_decodes_once() -> None:
+    """Test that iterating again reuses the decoded values."""
+    data_pb = PBReceiveMicrogridComponentsDataStreamResponse(microgrid_id=1)
+    msample = data_pb.components.add(component_id=2).metric_samples.add(
+        metric=Metric.AC_ACTIVE_POWER.to_proto()
+    )
+    msample.value.simple_metric.value = 42.0
+    batch = ComponentsDataBatch(_data_pb=data_pb)
+
+    samples = list(batch)
+    batch.to_columns()["value"][0] = 0.0
+    data_pb.Clear()
+
+    assert list(batch) == samples
+    assert batch.to_columns()["value"] == [42.0]
+
+
+@pytest.mark.parametrize(
+    "dt",
+    [
+        datetime(2024, 5, 1, 1, 2, 3, 456789),
+        datetime(2024, 5, 1, 1, 2, 3, 456789, tzinfo=timezone.utc),
+        datetime(2024, 5, 1, tzinfo=timezone(timedelta(hours=2))),
+        datetime(1969, 12, 31, 23, 59, 59, 500000),
+    ],
+)
+def test_set_timestamp_matches_from_datetime(dt: datetime) -> None:
+    """Test that timestamps are set like with `Timestamp.FromDatetime`."""
+    expected = PBTimestamp()
+    expected.FromDatetime(dt)
+    ts = PBTimestamp()
+    _set_timestamp(ts, dt)
+    assert ts == expected
+
+
+async def test_list_microgrid_components_data() -> None:
+    """Test that the samples of all batches in the stream are returned."""
+    data_pb = PBReceiveMicrogridComponentsDataStreamResponse(microgrid_id=1)
+    msample = data_pb.components.add(component_id=2).metric_samples.add(
+        metric=Metric.AC_ACTIVE_POWER.to_proto()
+    )
+    msample.sampled_at.seconds = 1_700_000_000
+    msample.value.simple_metric.value = 42.0
+
+    async def stream() -> AsyncIterator[PBReceiveMicrogridComponentsDataStreamResponse]:
+        yield data_pb
+        yield data_pb
+
+    stub = MagicMock()
+    stub.ReceiveMicrogridComponentsDataStream.return_value = stream()
+    with patch.object(
+        ReportingApiClient, "stub", new_callable=PropertyMock, return_value=stub
+    ):
+        client = ReportingApiClient("grpc://localhost:50051", connect=False)
+        samples = [
+            sample
+            async for sample in client.list_microgrid_components_data(
+                microgrid_components=[(1, [2])],
+                metrics=Metric.AC_ACTIVE_POWER,
+                start_dt=None,
+                end_dt=None,
+                resampling_period=None,
+            )
+        ]
+
+    ts = datetime(2023, 11, 14, 22, 13, 20, tzinfo=timezone.utc)
+    assert samples == [MetricSample(ts, 1, 2, "AC_ACTIVE_POWER", 42.0)] * 2
+
+
+async def test_iter_samples_does_not_wait_for_next_batch() -> None:
+    """Test that samples are yielded while the next batch is still pending."""
+    data_pb = PBReceiveMicrogridComponentsDataStreamResponse(microgrid_id=1)
+    msample = data_pb.components.add(component_id=2).metric_samples.add(
+        metric=Metric.AC_ACTIVE_POWER.to_proto()
+    )
+    msample.value.simple_metric.value = 42.0
+    next_batch = asyncio.Event()
+
+    async def batches() -> AsyncIterator[ComponentsDataBatch]:
+        yield ComponentsDataBatch(data_pb)
+        await next_batch.wait()
+        yield ComponentsDataBatch(data_pb)
+
+    samples = _iter_samples(batches())
+    first = await asyncio.wait_for(anext(samples), timeout=1)
+    next_batch.set()
+    assert [first] + [sample async for sample in samples] == [
+        MetricSample(
+            datetime(1970, 1, 1, tzinfo=timezone.utc), 1, 2, "AC_ACTIVE_POWER", 42.0
+        )
+    ] * 2
+
+
+def test_components_data_batch_iter_value_without_simple_metric() -> None:
+    """Test that samples without a simple metric value have no value."""
+    data_pb = PBReceiveMicrogridComponentsDataStreamResponse(microgrid_id=1)
+    cdata = data_pb.components.add(component_id=2)
+    cdata.metric_samples.add(metric=Metric.AC_ACTIVE_POWER.to_proto())
+    zero = cdata.metric_samples.add(metric=Metric.AC_ACTIVE_POWER.to_proto())
+    zero.value.simple_metric.value = 0.0
+
+    values = [sample.value for sample in ComponentsDataBatch(_data_pb=data_pb)]
+
+    assert values == [None, 0.0]